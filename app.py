@@ -1,38 +1,66 @@
 from fastapi import FastAPI, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import Optional
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field, StringConstraints
+from typing import Annotated, Any, List, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import orjson
 
 from database.connection import engine
-from database.utils import ensure_connectivity
+from database.utils import ensure_connectivity, get_table_names
 from functions.tables import create_student_table
 from functions.datatable import create_data_table
-from functions.update_data import update_all_students
+from functions.update_data import update_all_students, shutdown_stats_pool
+from functions.clients import close_client
 from functions.notification import (
     add_notification_for_table,
     remove_notification,
     create_notification_table,
     list_notifications,
 )
-from functions.data_fetch import build_json_list, SourceTableNotFound, DataTableNotFound
-from functions.students import insert_student, upsert_student, TableNotFoundError
+from functions.data_fetch import build_json_list, build_history, SourceTableNotFound, DataTableNotFound
+from functions.students import insert_student, upsert_student, bulk_upsert_students, TableNotFoundError
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import inspect, text
-from datetime import datetime, timezone, timedelta
+from sqlalchemy import text
 import os
 
 
 
 PASSWORD = os.getenv("PASSWORD")
+# Each /update already fans out to STATS_MAX_WORKERS students; cap how many runs overlap
+UPDATE_MAX_CONCURRENT = int(os.getenv("UPDATE_MAX_CONCURRENT", "2"))
+_update_slots = asyncio.Semaphore(max(1, UPDATE_MAX_CONCURRENT))
 
 
-def require_password(password: str = Query(..., description="API password")):
+async def require_password(password: str = Query(..., description="API password")):
     if password != PASSWORD:
         raise HTTPException(status_code=401, detail="Invalid password")
     return True
 
 
-app = FastAPI(title="Student DB API", version="1.0.0", dependencies=[Depends(require_password)])
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson; /data payloads are large enough for the C serializer to matter."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # The upstream HTTP client is shared across /update runs; release its connections on shutdown
+    await close_client()
+    shutdown_stats_pool()
+
+
+app = FastAPI(
+    title="Student DB API",
+    lifespan=lifespan,
+    version="1.0.0",
+    dependencies=[Depends(require_password)],
+    default_response_class=ORJSONResponse,
+)
 
 # CORS: allow all origins/headers/methods for compatibility
 app.add_middleware(
@@ -44,64 +72,83 @@ app.add_middleware(
 )
 
 
+# Shared identifier type so the pattern is declared (and compiled) once for every model
+TableName = Annotated[str, StringConstraints(min_length=1, pattern=r"^[A-Za-z_][A-Za-z0-9_]*$")]
+
+
 class AddTableRequest(BaseModel):
-    table_name: str = Field(..., min_length=1, pattern=r"^[A-Za-z_][A-Za-z0-9_]*$")
+    table_name: TableName
 
 
-class AddStudentRequest(BaseModel):
-    table_name: str = Field(..., min_length=1, pattern=r"^[A-Za-z_][A-Za-z0-9_]*$")
+class StudentEntry(BaseModel):
     name: str = Field(..., min_length=1, max_length=255)
     roll_number: int = Field(..., ge=0)
     github_username: Optional[str] = Field(default=None, max_length=255)
     leetcode_username: Optional[str] = Field(default=None, max_length=255)
 
 
+class AddStudentRequest(StudentEntry):
+    table_name: TableName
+
+
+class AddBatchRequest(BaseModel):
+    table_name: TableName
+    students: List[StudentEntry] = Field(..., min_length=1)
+
+
 class UpdateRequest(BaseModel):
-    table_name: str = Field(..., min_length=1, pattern=r"^[A-Za-z_][A-Za-z0-9_]*$")
+    table_name: TableName
 
 
 class DataRequest(BaseModel):
-    table_name: str = Field(..., min_length=1, pattern=r"^[A-Za-z_][A-Za-z0-9_]*$")
+    table_name: TableName
+    # Defaults to True so existing clients keep receiving the history blobs
+    include_history: bool = True
+
+
+class HistoryRequest(BaseModel):
+    table_name: TableName
+    roll_number: int = Field(..., ge=0)
 
 
 class AddNotifRequest(BaseModel):
-    table_name: str = Field(..., min_length=1, pattern=r"^[A-Za-z_][A-Za-z0-9_]*$")
+    table_name: TableName
     roll_number: int = Field(..., ge=0)
     reason: str = Field(..., min_length=1, max_length=1024)
 
 
 class RemoveNotifRequest(BaseModel):
-    table_name: str = Field(..., min_length=1, pattern=r"^[A-Za-z_][A-Za-z0-9_]*$")
+    table_name: TableName
     roll_number: int = Field(..., ge=0)
 
 
 @app.get("/health")
-def health():
-    ensure_connectivity(engine)
+async def health():
+    await ensure_connectivity(engine)
     return {"ok": True}
 
 
 @app.post("/addtable", status_code=201)
-def add_table(req: AddTableRequest):
-    created = create_student_table(engine, req.table_name)
+async def add_table(req: AddTableRequest):
+    created = await create_student_table(engine, req.table_name)
     if not created:
         raise HTTPException(status_code=409, detail=f"Table '{req.table_name}' already exists")
     return {"table": req.table_name, "created": True}
 
 
 @app.post("/addDataTable", status_code=201)
-def add_data_table(req: AddTableRequest):
-    created = create_data_table(engine, req.table_name)
+async def add_data_table(req: AddTableRequest):
+    created = await create_data_table(engine, req.table_name)
     if not created:
         raise HTTPException(status_code=409, detail=f"Table '{req.table_name}' already exists")
     return {"table": req.table_name, "created": True}
 
 
 @app.post("/add", status_code=201)
-def add_student(req: AddStudentRequest):
+async def add_student(req: AddStudentRequest):
     try:
         # Use upsert so existing roll_number rows are updated
-        row = upsert_student(
+        row = await upsert_student(
             engine,
             table_name=req.table_name,
             name=req.name,
@@ -120,12 +167,27 @@ def add_student(req: AddStudentRequest):
         raise HTTPException(status_code=400, detail=str(ie)) from ie
 
 
+@app.post("/addBatch", status_code=201)
+async def add_students_batch(req: AddBatchRequest):
+    try:
+        count = await bulk_upsert_students(engine, req.table_name, [s.model_dump() for s in req.students])
+        return {"table": req.table_name, "upserted": count}
+    except TableNotFoundError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Table '{req.table_name}' does not exist. Please call /addtable first.",
+        )
+    except IntegrityError as ie:
+        raise HTTPException(status_code=400, detail=str(ie)) from ie
+
+
 @app.post("/update")
-def update_tables(req: UpdateRequest):
+async def update_tables(req: UpdateRequest):
     source = req.table_name
     target = f"{source}_Data"
     try:
-        updated, errors = update_all_students(engine, source, target)
+        async with _update_slots:
+            updated, errors = await update_all_students(engine, source, target)
         return {"source_table": source, "target_table": target, "updated": updated, "errors": errors}
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
@@ -134,9 +196,9 @@ def update_tables(req: UpdateRequest):
 
 
 @app.post("/data")
-def get_data(req: DataRequest):
+async def get_data(req: DataRequest):
     try:
-        data = build_json_list(engine, req.table_name)
+        data = await build_json_list(engine, req.table_name, include_history=req.include_history)
         return data
     except SourceTableNotFound:
         raise HTTPException(status_code=400, detail=f"Table '{req.table_name}' does not exist")
@@ -144,11 +206,25 @@ def get_data(req: DataRequest):
         raise HTTPException(status_code=400, detail=f"Data table '{req.table_name}_Data' does not exist")
 
 
+@app.post("/data/history")
+async def get_history(req: HistoryRequest):
+    try:
+        item = await build_history(engine, req.table_name, req.roll_number)
+    except SourceTableNotFound:
+        raise HTTPException(status_code=400, detail=f"Table '{req.table_name}' does not exist")
+    except DataTableNotFound:
+        raise HTTPException(status_code=400, detail=f"Data table '{req.table_name}_Data' does not exist")
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"No data found for roll number {req.roll_number}")
+    return item
+
+
 @app.post("/addNotif")
-def add_notification(req: AddNotifRequest):
+async def add_notification(req: AddNotifRequest):
     try:
-        create_notification_table(engine)
-        result = add_notification_for_table(engine, req.table_name, req.roll_number, req.reason)
+        async with engine.begin() as conn:
+            await create_notification_table(conn)
+            result = await add_notification_for_table(conn, req.table_name, req.roll_number, req.reason)
         return {"ok": True, **result}
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
@@ -157,10 +233,11 @@ def add_notification(req: AddNotifRequest):
 
 
 @app.post("/removeNotif")
-def remove_notification_endpoint(req: RemoveNotifRequest):
+async def remove_notification_endpoint(req: RemoveNotifRequest):
     try:
-        create_notification_table(engine)
-        count = remove_notification(engine, req.table_name, req.roll_number)
+        async with engine.begin() as conn:
+            await create_notification_table(conn)
+            count = await remove_notification(conn, req.table_name, req.roll_number)
         if count == 0:
             return {"ok": True, "removed": 0, "detail": "No notification found for roll number"}
         return {"ok": True, "removed": count}
@@ -169,55 +246,45 @@ def remove_notification_endpoint(req: RemoveNotifRequest):
 
 
 @app.get("/showNotif")
-def show_notifications():
+async def show_notifications():
     try:
-        create_notification_table(engine)
-        return list_notifications(engine)
+        async with engine.begin() as conn:
+            await create_notification_table(conn)
+            return await list_notifications(conn)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/available")
-def available_tables():
-    inspector = inspect(engine)
-    try:
-        names = inspector.get_table_names()
-    except Exception:
-        # Fallback for Postgres public schema
-        names = inspector.get_table_names(schema="public")
+async def available_tables():
+    async with engine.connect() as conn:
+        names = await get_table_names(conn)
     # Exclude data tables (suffix _Data)
     base_tables = sorted([n for n in names if not n.endswith("_Data")])
     return {"tables": base_tables}
 
 
 @app.get("/lastUpdate")
-def last_update():
+async def last_update():
     """Return rows from update_Data with changed_at converted to UTC+05:30."""
-    IST = timezone(timedelta(hours=5, minutes=30))
-
-    def to_ist_str(dt: object) -> str:
-        if isinstance(dt, datetime):
-            d = dt
-            if d.tzinfo is None:
-                d = d.replace(tzinfo=timezone.utc)
-            d = d.astimezone(IST)
-            # format with milliseconds
-            ms = int(d.microsecond / 1000)
-            return f"{d.strftime('%Y-%m-%d %H:%M:%S')}.{ms:03d}"
-        return str(dt)
-
+    # Formatted server-side as 'YYYY-MM-DD HH24:MI:SS.MS' IST; naive timestamps are treated as UTC
     queries = [
-        'SELECT table_name, changed_at FROM "update_Data" ORDER BY changed_at DESC',
+        """
+        SELECT table_name,
+               CASE WHEN pg_typeof(changed_at) = 'timestamptz'::regtype
+                    THEN to_char(changed_at AT TIME ZONE 'Asia/Kolkata', 'YYYY-MM-DD HH24:MI:SS.MS')
+                    ELSE to_char((changed_at AT TIME ZONE 'UTC') AT TIME ZONE 'Asia/Kolkata', 'YYYY-MM-DD HH24:MI:SS.MS')
+               END AS changed_at
+        FROM "update_Data"
+        ORDER BY "update_Data".changed_at DESC
+        """,
     ]
     last_err = None
     for q in queries:
         try:
-            with engine.connect() as conn:
-                rows = conn.execute(text(q)).all()
-            return [
-                {"table_name": r[0], "changed_at": to_ist_str(r[1])}
-                for r in rows
-            ]
+            async with engine.connect() as conn:
+                rows = (await conn.execute(text(q))).all()
+            return [{"table_name": r[0], "changed_at": r[1]} for r in rows]
         except Exception as e:
             last_err = e
             continue
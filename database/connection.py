@@ -1,5 +1,10 @@
 import os
-from sqlalchemy import create_engine
+from uuid import uuid4
+import orjson
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DisconnectionError
+from sqlalchemy.ext.asyncio import create_async_engine
 from dotenv import load_dotenv
 
 
@@ -7,12 +12,19 @@ load_dotenv()
 
 
 def _normalize_db_url(url: str) -> str:
+    # SQLAlchemy 2.x prefers postgresql[+driver] scheme; normalize common 'postgres://' URLs
+    # and explicitly select the asyncpg driver.
     if url.startswith("postgres://"):
-        return "postgresql+psycopg2://" + url[len("postgres://") :]
-    if url.startswith("postgresql://"):
-        # explicitly select psycopg2 driver
-        return "postgresql+psycopg2://" + url[len("postgresql://") :]
-    return url
+        url = "postgresql://" + url[len("postgres://") :]
+    u = make_url(url)
+    if u.drivername in ("postgresql", "postgresql+psycopg2"):
+        u = u.set(drivername="postgresql+asyncpg")
+    # asyncpg does not understand libpq-only query params (e.g. Neon's sslmode/channel_binding)
+    sslmode = u.query.get("sslmode")
+    u = u.difference_update_query(["sslmode", "channel_binding"])
+    if sslmode and "ssl" not in u.query:
+        u = u.update_query_dict({"ssl": sslmode})
+    return u.render_as_string(hide_password=False)
 
 
 raw_url = os.getenv("POSTGRES_CONNECT_STRING")
@@ -20,22 +32,38 @@ if not raw_url:
     raise RuntimeError("POSTGRES_CONNECT_STRING not set in environment/.env")
 DATABASE_URL = _normalize_db_url(raw_url)
 
-# SQLAlchemy 2.x prefers postgresql[+driver] scheme; normalize common 'postgres://' URLs.
-if DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql+psycopg2://", 1)
-elif DATABASE_URL.startswith("postgresql://"):
-    # Explicitly add psycopg2 driver if not present
-    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg2://", 1)
-
 # Pool settings tuned for simple API usage
 # Allow tuning via env vars; set higher defaults for Neon pooler
 POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
 MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "40"))
+# SQLAlchemy's per-connection prepared-statement LRU. 0 is the setting for transaction-mode poolers
+# (e.g. PgBouncer): it also disables asyncpg's own cache and gives every prepared statement a unique
+# name, since the dialect still prepares each statement and a pooler may hand it another backend.
+STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "1024"))
+# Recycle before server/pooler idle timeouts; pre-ping (a SELECT 1 per checkout) is opt-in
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "").lower() in ("1", "true", "yes")
+
+_connect_args = {"prepared_statement_cache_size": STATEMENT_CACHE_SIZE}
+if STATEMENT_CACHE_SIZE == 0:
+    _connect_args["statement_cache_size"] = 0
+    _connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
 
-engine = create_engine(
+engine = create_async_engine(
     DATABASE_URL,
-    pool_pre_ping=True,
+    pool_pre_ping=POOL_PRE_PING,
+    pool_recycle=POOL_RECYCLE,
     pool_size=POOL_SIZE,
     max_overflow=MAX_OVERFLOW,
-    future=True,
+    connect_args=_connect_args,
+    # JSONB arrives in binary format; decode the history blobs with orjson instead of the stdlib
+    json_deserializer=orjson.loads,
 )
+
+
+@event.listens_for(engine.sync_engine, "checkout")
+def _discard_closed(dbapi_connection, connection_record, connection_proxy):
+    # Free replacement for pre-ping: asyncpg notices server-side closes (e.g. Neon suspending
+    # the compute) on its own; raising here makes the pool retry with a fresh connection.
+    if dbapi_connection.driver_connection.is_closed():
+        raise DisconnectionError("connection closed by server")
@@ -1,10 +1,93 @@
-from sqlalchemy import MetaData, text
-from sqlalchemy.engine import Engine
+from typing import Dict, List
+from cachetools import TTLCache
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
 
 
 metadata = MetaData()
 
+# Table-existence answers keyed by table name; short TTL so external DDL is picked up
+_table_exists_cache: TTLCache = TTLCache(maxsize=1024, ttl=60)
+_table_names_cache: TTLCache = TTLCache(maxsize=1, ttl=60)
 
-def ensure_connectivity(engine: Engine) -> None:
-    with engine.connect() as conn:
-        conn.execute(text("SELECT 1"))
+
+async def ensure_connectivity(engine: AsyncEngine) -> None:
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def has_table(conn: AsyncConnection, table_name: str) -> bool:
+    return await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table(table_name))
+
+
+async def has_table_cached(engine: AsyncEngine, table_name: str) -> bool:
+    """Like has_table, but only hits the catalog when the answer isn't cached."""
+    exists = _table_exists_cache.get(table_name)
+    if exists is None:
+        async with engine.connect() as conn:
+            exists = await has_table(conn, table_name)
+        _table_exists_cache[table_name] = exists
+    return exists
+
+
+async def tables_exist(conn: AsyncConnection, *table_names: str) -> Dict[str, bool]:
+    """Cached existence for several tables; misses are probed together with one to_regclass query."""
+    found: Dict[str, bool] = {}
+    missing: List[str] = []
+    for name in table_names:
+        exists = _table_exists_cache.get(name)
+        if exists is None:
+            missing.append(name)
+        else:
+            found[name] = exists
+    if missing:
+        probes = ", ".join(f"to_regclass(CAST(:t{i} AS text)) IS NOT NULL" for i in range(len(missing)))
+        params = {f"t{i}": '"' + name.replace('"', '""') + '"' for i, name in enumerate(missing)}
+        row = (await conn.execute(text(f"SELECT {probes}"), params)).first()
+        for name, exists in zip(missing, row):
+            found[name] = _table_exists_cache[name] = bool(exists)
+    return found
+
+
+def mark_table_exists(table_name: str, exists: bool = True) -> None:
+    _table_exists_cache[table_name] = exists
+    _table_names_cache.clear()
+
+
+def forget_table(table_name: str) -> None:
+    """Drop any cached answer for table_name, e.g. after DDL in a not-yet-committed transaction."""
+    _table_exists_cache.pop(table_name, None)
+    _table_names_cache.clear()
+
+
+async def get_table_names(conn: AsyncConnection) -> List[str]:
+    def _names(sync_conn) -> List[str]:
+        inspector = inspect(sync_conn)
+        try:
+            return inspector.get_table_names()
+        except Exception:
+            # Fallback for Postgres public schema
+            return inspector.get_table_names(schema="public")
+
+    return await conn.run_sync(_names)
+
+
+async def list_tables(conn: AsyncConnection) -> List[str]:
+    """Ordinary/partitioned table names in the current schema, read from pg_class in one query."""
+    rows = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_catalog.pg_class c "
+            "JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'p') "
+            "ORDER BY c.relname"
+        )
+    )
+    return [r[0] for r in rows]
+
+
+async def get_table_names_cached(conn: AsyncConnection) -> List[str]:
+    names = _table_names_cache.get("names")
+    if names is None:
+        names = await list_tables(conn)
+        _table_names_cache["names"] = names
+    return names
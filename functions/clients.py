@@ -1,23 +1,93 @@
 import os
-import requests
+import asyncio
+import httpx
 from dotenv import load_dotenv
-from typing import Any, Dict, List
-import urllib3
-from urllib3.exceptions import InsecureRequestWarning
+from typing import Any, Dict, List, Optional, Tuple
 
 
 load_dotenv()
 GITHUB_API = os.getenv("GITHUB_API", "").rstrip("/")
 LEETCODE_API = os.getenv("LEETCODE_API", "").rstrip("/")
 
-# Suppress warnings because we intentionally disable verification per user request
-urllib3.disable_warnings(InsecureRequestWarning)
+# 30s read like before, but fail fast on connect
+TIMEOUT = httpx.Timeout(30.0, connect=5.0)
 
+# Students fetched at once during /update; each one issues up to CALLS_PER_STUDENT requests concurrently
+STATS_MAX_WORKERS = max(1, int(os.getenv("STATS_MAX_WORKERS", "16")))
+CALLS_PER_STUDENT = 6
 
-def _session() -> requests.Session:
-    s = requests.Session()
-    s.verify = False
-    return s
+# Concurrent requests per upstream, so a throttling LeetCode doesn't hold up GitHub calls (and vice versa)
+GITHUB_MAX_CONCURRENCY = max(1, int(os.getenv("GITHUB_MAX_CONCURRENCY", "16")))
+LEETCODE_MAX_CONCURRENCY = max(1, int(os.getenv("LEETCODE_MAX_CONCURRENCY", "8")))
+# Most requests that can be in flight at once; the pool keeps each of them on a warm connection
+MAX_IN_FLIGHT = min(STATS_MAX_WORKERS * CALLS_PER_STUDENT, GITHUB_MAX_CONCURRENCY + LEETCODE_MAX_CONCURRENCY)
+
+# Gateway errors from the upstream APIs are usually transient
+_RETRY_STATUSES = frozenset({502, 503, 504})
+_MAX_RETRIES = 2
+_BACKOFF = 0.3
+
+
+def make_client() -> httpx.AsyncClient:
+    """Async client for the upstream APIs; HTTP/2 multiplexes the per-student calls on one connection per host."""
+    # TLS verification is intentionally disabled per user request
+    transport = httpx.AsyncHTTPTransport(
+        http2=True,
+        verify=False,
+        retries=2,  # connect errors only
+        limits=httpx.Limits(
+            max_connections=MAX_IN_FLIGHT,
+            max_keepalive_connections=MAX_IN_FLIGHT,
+            keepalive_expiry=300,
+        ),
+    )
+    return httpx.AsyncClient(transport=transport, timeout=TIMEOUT)
+
+
+_client: Optional[httpx.AsyncClient] = None
+_host_sems: Optional[Tuple[asyncio.Semaphore, asyncio.Semaphore]] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Process-wide client, so warm TLS connections are reused across /update runs."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = make_client()
+    return _client
+
+
+def _host_limits() -> Tuple[asyncio.Semaphore, asyncio.Semaphore]:
+    """(github, leetcode) semaphores; created lazily so they bind to the running loop."""
+    global _host_sems
+    if _host_sems is None:
+        _host_sems = (asyncio.Semaphore(GITHUB_MAX_CONCURRENCY), asyncio.Semaphore(LEETCODE_MAX_CONCURRENCY))
+    return _host_sems
+
+
+async def _limited(sem: asyncio.Semaphore, coro):
+    async with sem:
+        return await coro
+
+
+async def close_client() -> None:
+    global _client, _host_sems
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _host_sems = None
+
+
+# LeetCode path variants that answered last time; tried first so the usual case is one request
+_LC_PROFILE_PATHS = ("/userprofile/{}", "/{}", "/userProfile/{}")
+_LC_LANGUAGE_PATHS = ("/languageStats", "/languagestats")
+_lc_profile_path: Optional[str] = None
+_lc_language_path: Optional[str] = None
+
+
+def _preferred_first(paths: Tuple[str, ...], preferred: Optional[str]) -> Tuple[str, ...]:
+    if preferred is None:
+        return paths
+    return (preferred,) + tuple(p for p in paths if p != preferred)
 
 
 class ApiError(Exception):
@@ -30,69 +100,100 @@ def _require_base(name: str, value: str) -> str:
     return value
 
 
-def get_github_summary(username: str) -> Dict[str, Any]:
+async def _get(client: httpx.AsyncClient, url: str, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+    """GET, retrying 502/503/504 responses up to _MAX_RETRIES times with exponential backoff."""
+    for attempt in range(_MAX_RETRIES + 1):
+        r = await client.get(url, params=params)
+        if r.status_code not in _RETRY_STATUSES or attempt == _MAX_RETRIES:
+            return r
+        await asyncio.sleep(_BACKOFF * (2 ** attempt))
+
+
+async def get_github_summary(client: httpx.AsyncClient, username: str) -> Dict[str, Any]:
     base = _require_base("GITHUB_API", GITHUB_API)
     url = f"{base}/api"
     params = {"username": username}
-    with _session() as s:
-        r = s.get(url, params=params, timeout=30)
-        r.raise_for_status()
-        return r.json()
+    r = await _get(client, url, params=params)
+    r.raise_for_status()
+    return r.json()
 
 
-def get_leetcode_profile(username: str) -> Dict[str, Any]:
+async def get_leetcode_profile(client: httpx.AsyncClient, username: str) -> Dict[str, Any]:
+    global _lc_profile_path
     base = _require_base("LEETCODE_API", LEETCODE_API)
-    with _session() as s:
-        # Try lowercase path first (per endpoint.txt), then common alternates
-        for path in [f"/userprofile/{username}", f"/{username}", f"/userProfile/{username}"]:
-            r = s.get(base + path, timeout=30)
-            if r.status_code == 404:
-                continue
-            r.raise_for_status()
-            return r.json()
+    # Try lowercase path first (per endpoint.txt), then common alternates
+    for path in _preferred_first(_LC_PROFILE_PATHS, _lc_profile_path):
+        r = await _get(client, base + path.format(username))
+        if r.status_code == 404:
+            continue
+        r.raise_for_status()
+        _lc_profile_path = path
+        return r.json()
     raise ApiError("LeetCode profile endpoint not found for provided username")
 
 
-def get_leetcode_language_stats(username: str) -> Dict[str, Any]:
+async def get_leetcode_language_stats(client: httpx.AsyncClient, username: str) -> Dict[str, Any]:
+    global _lc_language_path
     base = _require_base("LEETCODE_API", LEETCODE_API)
-    with _session() as s:
-        # The OpenAPI shows /languageStats; endpoint.txt shows /languagestats
-        for path in ["/languageStats", "/languagestats"]:
-            r = s.get(base + path, params={"username": username}, timeout=30)
-            if r.status_code == 404:
-                continue
-            r.raise_for_status()
-            return r.json()
+    # The OpenAPI shows /languageStats; endpoint.txt shows /languagestats
+    for path in _preferred_first(_LC_LANGUAGE_PATHS, _lc_language_path):
+        r = await _get(client, base + path, params={"username": username})
+        if r.status_code == 404:
+            continue
+        r.raise_for_status()
+        _lc_language_path = path
+        return r.json()
     raise ApiError("LeetCode language stats endpoint not found")
 
 
-def get_leetcode_badges(username: str) -> Dict[str, Any]:
+async def get_leetcode_badges(client: httpx.AsyncClient, username: str) -> Dict[str, Any]:
     base = _require_base("LEETCODE_API", LEETCODE_API)
     url = f"{base}/{username}/badges"
-    with _session() as s:
-        r = s.get(url, timeout=30)
-        r.raise_for_status()
-        return r.json()
+    r = await _get(client, url)
+    r.raise_for_status()
+    return r.json()
 
 
-def get_github_contributions(username: str) -> Dict[str, Any]:
+async def get_github_contributions(client: httpx.AsyncClient, username: str) -> Dict[str, Any]:
     """Fetch daily GitHub contributions (calendar-style) for a username.
     Endpoint returns structure with weeks -> contributionDays {date, contributionCount}.
     """
     base = _require_base("GITHUB_API", GITHUB_API)
     url = f"{base}/contri"
     params = {"username": username}
-    with _session() as s:
-        r = s.get(url, params=params, timeout=30)
-        r.raise_for_status()
-        return r.json()
+    r = await _get(client, url, params=params)
+    r.raise_for_status()
+    return r.json()
 
 
-def get_leetcode_calendar(username: str) -> Dict[str, Any]:
+async def get_leetcode_calendar(client: httpx.AsyncClient, username: str) -> Dict[str, Any]:
     """Fetch LeetCode submission calendar; typically contains submissionCalendar as JSON string."""
     base = _require_base("LEETCODE_API", LEETCODE_API)
     url = f"{base}/{username}/calendar"
-    with _session() as s:
-        r = s.get(url, timeout=30)
-        r.raise_for_status()
-        return r.json()
+    r = await _get(client, url)
+    r.raise_for_status()
+    return r.json()
+
+
+async def fetch_student(client: httpx.AsyncClient, github_username: str, leetcode_username: str) -> Dict[str, Dict[str, Any]]:
+    """Fetch every upstream payload for one student concurrently.
+
+    Keys match the compute_stats arguments; sources without a username are omitted.
+    Raises the first error encountered.
+    """
+    gh_sem, lc_sem = _host_limits()
+    calls = {}
+    if github_username:
+        calls["git_json"] = _limited(gh_sem, get_github_summary(client, github_username))
+        calls["git_contri"] = _limited(gh_sem, get_github_contributions(client, github_username))
+    if leetcode_username:
+        calls["lc_prof"] = _limited(lc_sem, get_leetcode_profile(client, leetcode_username))
+        calls["lc_lang"] = _limited(lc_sem, get_leetcode_language_stats(client, leetcode_username))
+        calls["lc_badges"] = _limited(lc_sem, get_leetcode_badges(client, leetcode_username))
+        calls["lc_calendar"] = _limited(lc_sem, get_leetcode_calendar(client, leetcode_username))
+    # return_exceptions so a failing call doesn't leave its siblings running unobserved
+    results = await asyncio.gather(*calls.values(), return_exceptions=True)
+    for res in results:
+        if isinstance(res, BaseException):
+            raise res
+    return dict(zip(calls, results))
@@ -1,10 +1,11 @@
 from typing import Optional, List, Dict, Any
 from datetime import datetime
-from sqlalchemy import select, inspect
-from sqlalchemy.engine import Engine
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from database.utils import tables_exist
 from functions.tables import student_table
 from functions.datatable import data_table
-import json
+import orjson
 
 
 class SourceTableNotFound(Exception):
@@ -15,19 +16,34 @@ class DataTableNotFound(Exception):
     pass
 
 
-def build_jsonl(engine: Engine, src_name: str, dst_name: Optional[str] = None) -> str:
+def _to_json_obj(v: Any) -> Any:
+    # JSONB normally decodes to dict/list already; only string-encoded rows need parsing
+    if v is None or isinstance(v, (dict, list)):
+        return v
+    if isinstance(v, str):
+        try:
+            return orjson.loads(v)
+        except Exception:
+            return None
+    return None
+
+
+async def _require_tables(conn: AsyncConnection, src_name: str, dst_name: str) -> None:
+    # Both probes share one roundtrip (and none at all once cached)
+    exists = await tables_exist(conn, src_name, dst_name)
+    if not exists[src_name]:
+        raise SourceTableNotFound(src_name)
+    if not exists[dst_name]:
+        raise DataTableNotFound(dst_name)
+
+
+async def build_jsonl(engine: AsyncEngine, src_name: str, dst_name: Optional[str] = None) -> str:
     """Return NDJSON combining rows from src (students) and dst (data) by roll number.
 
     - If dst_name is None, uses f"{src_name}_Data".
     - Raises SourceTableNotFound or DataTableNotFound accordingly.
     """
-    inspector = inspect(engine)
-    if not inspector.has_table(src_name):
-        raise SourceTableNotFound(src_name)
     dst_tbl_name = dst_name or f"{src_name}_Data"
-    if not inspector.has_table(dst_tbl_name):
-        raise DataTableNotFound(dst_tbl_name)
-
     src = student_table(src_name)
     dst = data_table(dst_tbl_name)
 
@@ -64,78 +80,76 @@ def build_jsonl(engine: Engine, src_name: str, dst_name: Optional[str] = None) -
     )
 
     lines: List[str] = []
-    with engine.connect() as conn:
-        for row in conn.execute(stmt).mappings():
-            lines.append(json.dumps(dict(row)))
+    async with engine.connect() as conn:
+        await _require_tables(conn, src_name, dst_tbl_name)
+        result = await conn.execute(stmt)
+        for row in result.mappings():
+            lines.append(orjson.dumps(dict(row), option=orjson.OPT_NON_STR_KEYS).decode())
 
     return "\n".join(lines) + ("\n" if lines else "")
 
 
-def build_json_list(engine: Engine, src_name: str, dst_name: Optional[str] = None) -> List[Dict[str, Any]]:
-    """Return a list of dicts combining rows from src and dst tables by roll number."""
-    inspector = inspect(engine)
-    if not inspector.has_table(src_name):
-        raise SourceTableNotFound(src_name)
-    dst_tbl_name = dst_name or f"{src_name}_Data"
-    if not inspector.has_table(dst_tbl_name):
-        raise DataTableNotFound(dst_tbl_name)
+_HISTORY_COLUMNS = ("gh_contribution_history", "lc_submission_history", "lc_progress_history")
 
+
+async def build_json_list(
+    engine: AsyncEngine,
+    src_name: str,
+    dst_name: Optional[str] = None,
+    include_history: bool = True,
+) -> List[Dict[str, Any]]:
+    """Return a list of dicts combining rows from src and dst tables by roll number.
+
+    With include_history=False the three JSONB history columns are not selected at all.
+    """
+    dst_tbl_name = dst_name or f"{src_name}_Data"
     src = student_table(src_name)
     dst = data_table(dst_tbl_name)
 
+    columns = [
+        src.c.name.label("name"),
+        src.c.roll_number.label("roll_number"),
+        src.c.github_username.label("github_username"),
+        src.c.leetcode_username.label("leetcode_username"),
+        dst.c.git_followers,
+        dst.c.git_following,
+        dst.c.git_public_repo,
+        dst.c.git_original_repo,
+        dst.c.git_authored_repo,
+        dst.c.last_commit_date,
+        dst.c.git_badges,
+        dst.c.lc_total_solved,
+        dst.c.lc_easy,
+        dst.c.lc_medium,
+        dst.c.lc_hard,
+        dst.c.lc_ranking,
+        dst.c.lc_lastsubmission,
+        dst.c.lc_lastacceptedsubmission,
+        dst.c.lc_cur_streak,
+        dst.c.lc_max_streak,
+        dst.c.lc_badges,
+        dst.c.lc_language,
+    ]
+    if include_history:
+        columns.extend(dst.c[c] for c in _HISTORY_COLUMNS)
+
     stmt = (
-        select(
-            src.c.name.label("name"),
-            src.c.roll_number.label("roll_number"),
-            src.c.github_username.label("github_username"),
-            src.c.leetcode_username.label("leetcode_username"),
-            dst.c.git_followers,
-            dst.c.git_following,
-            dst.c.git_public_repo,
-            dst.c.git_original_repo,
-            dst.c.git_authored_repo,
-            dst.c.last_commit_date,
-            dst.c.git_badges,
-            dst.c.lc_total_solved,
-            dst.c.lc_easy,
-            dst.c.lc_medium,
-            dst.c.lc_hard,
-            dst.c.lc_ranking,
-            dst.c.lc_lastsubmission,
-            dst.c.lc_lastacceptedsubmission,
-                dst.c.lc_cur_streak,
-                dst.c.lc_max_streak,
-            dst.c.lc_badges,
-            dst.c.lc_language,
-            dst.c.gh_contribution_history,
-            dst.c.lc_submission_history,
-            dst.c.lc_progress_history,
-        )
+        select(*columns)
         .select_from(src.outerjoin(dst, src.c.roll_number == dst.c.rollnumber))
         .order_by(src.c.roll_number)
     )
 
     results: List[Dict[str, Any]] = []
-    with engine.connect() as conn:
-        def _to_json_obj(v):
-            if v is None:
-                return None
-            if isinstance(v, (dict, list)):
-                return v
-            if isinstance(v, str):
-                try:
-                    return json.loads(v)
-                except Exception:
-                    return None
-            return None
-
-        for row in conn.execute(stmt).mappings():
+    async with engine.connect() as conn:
+        await _require_tables(conn, src_name, dst_tbl_name)
+        result = await conn.execute(stmt)
+        for row in result.mappings():
             item = dict(row)
-            # normalize history fields to JSON objects if stored as strings
-            item["gh_contribution_history"] = _to_json_obj(item.get("gh_contribution_history"))
-            item["lc_submission_history"] = _to_json_obj(item.get("lc_submission_history"))
-            item["lc_progress_history"] = _to_json_obj(item.get("lc_progress_history"))
-            item["lc_progress_history"] = _to_json_obj(item.get("lc_progress_history"))
+            if include_history:
+                # normalize history fields to JSON objects if stored as strings
+                item["gh_contribution_history"] = _to_json_obj(item.get("gh_contribution_history"))
+                item["lc_submission_history"] = _to_json_obj(item.get("lc_submission_history"))
+                item["lc_progress_history"] = _to_json_obj(item.get("lc_progress_history"))
             lcd = (item.get("last_commit_date") or "").strip()
             if lcd:
                 try:
@@ -148,3 +162,23 @@ def build_json_list(engine: Engine, src_name: str, dst_name: Optional[str] = Non
             results.append(item)
 
     return results
+
+
+async def build_history(
+    engine: AsyncEngine, src_name: str, roll_number: int, dst_name: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """Return the history columns for a single student, or None if it has no data row."""
+    dst_tbl_name = dst_name or f"{src_name}_Data"
+    dst = data_table(dst_tbl_name)
+    stmt = select(*(dst.c[c] for c in _HISTORY_COLUMNS)).where(dst.c.rollnumber == roll_number)
+
+    async with engine.connect() as conn:
+        await _require_tables(conn, src_name, dst_tbl_name)
+        row = (await conn.execute(stmt)).mappings().first()
+
+    if row is None:
+        return None
+    item: Dict[str, Any] = {"roll_number": roll_number}
+    for c in _HISTORY_COLUMNS:
+        item[c] = _to_json_obj(row[c])
+    return item
@@ -1,44 +1,109 @@
-from sqlalchemy import Table, Column, BigInteger, Integer, String
-from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.engine import Engine
-from sqlalchemy import inspect
-from database.utils import metadata
+import os
+from typing import Any, Dict, List, Tuple
+from sqlalchemy import Table, Column, BigInteger, Integer, String, text
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from database.utils import metadata, has_table_cached, mark_table_exists
+
+
+# Row count from which bulk_upsert_data stages through COPY instead of executemany
+COPY_THRESHOLD = int(os.getenv("DB_COPY_THRESHOLD", "256"))
+
+_table_cache: dict[str, Table] = {}
+# Upsert statements by (table, payload columns); built once, reused for every batch
+_upsert_cache: dict[Tuple[str, Tuple[str, ...]], Any] = {}
 
 
 def data_table(table_name: str) -> Table:
-    return Table(
-        table_name,
-        metadata,
-        Column("rollnumber", BigInteger, primary_key=True),
-        Column("git_followers", Integer),
-        Column("git_following", Integer),
-        Column("git_public_repo", Integer),
-        Column("git_original_repo", Integer),
-        Column("git_authored_repo", Integer),
-        Column("last_commit_date", String(64)),
-        Column("git_badges", String(1024)),
-        Column("lc_total_solved", Integer),
-        Column("lc_easy", Integer),
-        Column("lc_medium", Integer),
-        Column("lc_hard", Integer),
-        Column("lc_ranking", BigInteger),
-        Column("lc_lastsubmission", String(64)),
-    Column("lc_lastacceptedsubmission", String(64)),
-    Column("lc_cur_streak", Integer),
-    Column("lc_max_streak", Integer),
-        Column("lc_badges", String(1024)),
-        Column("lc_language", String(1024)),
-        Column("gh_contribution_history", JSONB),
-        Column("lc_submission_history", JSONB),
-        Column("lc_progress_history", JSONB),
-        extend_existing=True,
-    )
+    tbl = _table_cache.get(table_name)
+    if tbl is None:
+        tbl = _table_cache[table_name] = Table(
+            table_name,
+            metadata,
+            Column("rollnumber", BigInteger, primary_key=True),
+            Column("git_followers", Integer),
+            Column("git_following", Integer),
+            Column("git_public_repo", Integer),
+            Column("git_original_repo", Integer),
+            Column("git_authored_repo", Integer),
+            Column("last_commit_date", String(64)),
+            Column("git_badges", String(1024)),
+            Column("lc_total_solved", Integer),
+            Column("lc_easy", Integer),
+            Column("lc_medium", Integer),
+            Column("lc_hard", Integer),
+            Column("lc_ranking", BigInteger),
+            Column("lc_lastsubmission", String(64)),
+            Column("lc_lastacceptedsubmission", String(64)),
+            Column("lc_cur_streak", Integer),
+            Column("lc_max_streak", Integer),
+            Column("lc_badges", String(1024)),
+            Column("lc_language", String(1024)),
+            Column("gh_contribution_history", JSONB),
+            Column("lc_submission_history", JSONB),
+            Column("lc_progress_history", JSONB),
+            extend_existing=True,
+        )
+    return tbl
 
 
-def create_data_table(engine: Engine, table_name: str) -> bool:
-    inspector = inspect(engine)
-    if inspector.has_table(table_name):
+async def create_data_table(engine: AsyncEngine, table_name: str) -> bool:
+    if await has_table_cached(engine, table_name):
         return False
     tbl = data_table(table_name)
-    metadata.create_all(bind=engine, tables=[tbl])
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all, tables=[tbl])
+    mark_table_exists(table_name)
     return True
+
+
+async def bulk_upsert_data(conn: AsyncConnection, table_name: str, rows: List[Dict[str, Any]]) -> int:
+    """Upsert rows keyed by rollnumber; returns the number of rows sent.
+
+    Uses one executemany, or COPY into a temp staging table plus one INSERT ... SELECT for
+    COPY_THRESHOLD rows and up. Every row must carry the same keys (those of the first row);
+    other columns are left untouched on conflict.
+    """
+    if not rows:
+        return 0
+    tbl = data_table(table_name)
+    if len(rows) >= COPY_THRESHOLD:
+        return await _copy_upsert_data(conn, tbl, rows)
+    key = (table_name, tuple(rows[0]))
+    stmt = _upsert_cache.get(key)
+    if stmt is None:
+        ins = pg_insert(tbl)
+        stmt = _upsert_cache[key] = ins.on_conflict_do_update(
+            index_elements=[tbl.c.rollnumber],
+            set_={k: ins.excluded[k] for k in key[1] if k != "rollnumber"},
+        )
+    await conn.execute(stmt, rows)
+    return len(rows)
+
+
+async def _copy_upsert_data(conn: AsyncConnection, tbl: Table, rows: List[Dict[str, Any]]) -> int:
+    columns = list(rows[0])
+    # COPY bypasses SQLAlchemy's type processing; apply it here so JSONB values are stored
+    # exactly as the executemany path would store them
+    procs = [tbl.c[c].type.bind_processor(conn.dialect) for c in columns]
+    records = [
+        tuple(p(row[c]) if p else row[c] for c, p in zip(columns, procs))
+        for row in rows
+    ]
+    target = '"' + tbl.name.replace('"', '""') + '"'
+    col_list = ", ".join(columns)
+    set_list = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c != "rollnumber")
+
+    # Reused across flushes in the same transaction (an earlier one may have failed before cleaning up);
+    # ON COMMIT DROP removes it at the end
+    await conn.execute(text(f"CREATE TEMP TABLE IF NOT EXISTS _stage_data (LIKE {target} INCLUDING DEFAULTS) ON COMMIT DROP"))
+    await conn.execute(text("TRUNCATE _stage_data"))
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table("_stage_data", records=records, columns=columns)
+    await conn.execute(
+        text(
+            f"INSERT INTO {target} ({col_list}) SELECT {col_list} FROM _stage_data "
+            f"ON CONFLICT (rollnumber) DO UPDATE SET {set_list}"
+        )
+    )
+    return len(records)
@@ -1,7 +1,7 @@
-from typing import Optional, Dict, Any
-from sqlalchemy import insert, select, update
-from sqlalchemy.engine import Engine
-from sqlalchemy import inspect
+from typing import Optional, Dict, Any, List
+from sqlalchemy import insert, update, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from database.utils import has_table_cached
 from functions.tables import student_table, ensure_rollnumber_bigint
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.dialects.postgresql import insert as pg_insert
@@ -11,8 +11,8 @@ class TableNotFoundError(Exception):
     pass
 
 
-def insert_student(
-    engine: Engine,
+async def insert_student(
+    engine: AsyncEngine,
     *,
     table_name: str,
     name: str,
@@ -20,36 +20,34 @@ def insert_student(
     github_username: Optional[str],
     leetcode_username: Optional[str],
 ) -> Dict[str, Any]:
-    inspector = inspect(engine)
-    if not inspector.has_table(table_name):
+    if not await has_table_cached(engine, table_name):
         raise TableNotFoundError(table_name)
 
     tbl = student_table(table_name)
     # ensure schema can accept large roll numbers
-    ensure_rollnumber_bigint(engine, table_name)
-    with engine.begin() as conn:
-        conn.execute(
-            insert(tbl).values(
+    await ensure_rollnumber_bigint(engine, table_name)
+    async with engine.begin() as conn:
+        row = (await conn.execute(
+            insert(tbl)
+            .values(
                 name=name,
                 roll_number=roll_number,
                 github_username=github_username,
                 leetcode_username=leetcode_username,
             )
-        )
-        row = conn.execute(
-            select(
+            .returning(
                 tbl.c.name,
                 tbl.c.roll_number,
                 tbl.c.github_username,
                 tbl.c.leetcode_username,
-            ).where(tbl.c.roll_number == roll_number)
-        ).mappings().first()
+            )
+        )).mappings().first()
 
     return dict(row)
 
 
-def upsert_student(
-    engine: Engine,
+async def upsert_student(
+    engine: AsyncEngine,
     *,
     table_name: str,
     name: str,
@@ -61,14 +59,13 @@ def upsert_student(
 
     Returns the resulting row as a dict.
     """
-    inspector = inspect(engine)
-    if not inspector.has_table(table_name):
+    if not await has_table_cached(engine, table_name):
         raise TableNotFoundError(table_name)
 
     tbl = student_table(table_name)
-    ensure_rollnumber_bigint(engine, table_name)
+    await ensure_rollnumber_bigint(engine, table_name)
 
-    with engine.begin() as conn:
+    async with engine.begin() as conn:
         # Use Postgres ON CONFLICT upsert to avoid transaction aborts
         stmt = (
             pg_insert(tbl)
@@ -86,16 +83,52 @@ def upsert_student(
                     leetcode_username=leetcode_username,
                 ),
             )
-        )
-        conn.execute(stmt)
-
-        row = conn.execute(
-            select(
+            # Hand back the written row in the same roundtrip
+            .returning(
                 tbl.c.name,
                 tbl.c.roll_number,
                 tbl.c.github_username,
                 tbl.c.leetcode_username,
-            ).where(tbl.c.roll_number == roll_number)
-        ).mappings().first()
+            )
+        )
+        row = (await conn.execute(stmt)).mappings().first()
 
     return dict(row)
+
+
+async def bulk_upsert_students(engine: AsyncEngine, table_name: str, students: List[Dict[str, Any]]) -> int:
+    """Upsert many students at once: COPY into a temp staging table, then one INSERT ... ON CONFLICT.
+
+    Later entries win when a roll_number repeats. Returns the number of rows written.
+    """
+    if not await has_table_cached(engine, table_name):
+        raise TableNotFoundError(table_name)
+    await ensure_rollnumber_bigint(engine, table_name)
+
+    # ON CONFLICT cannot touch the same row twice in one statement, so collapse duplicates first
+    by_roll = {int(s["roll_number"]): s for s in students}
+    if not by_roll:
+        return 0
+    columns = ["name", "roll_number", "github_username", "leetcode_username"]
+    records = [
+        (s["name"], roll, s.get("github_username"), s.get("leetcode_username"))
+        for roll, s in by_roll.items()
+    ]
+    target = '"' + table_name.replace('"', '""') + '"'
+
+    async with engine.begin() as conn:
+        await conn.execute(text(f"CREATE TEMP TABLE _stage_students (LIKE {target} INCLUDING DEFAULTS) ON COMMIT DROP"))
+        raw = await conn.get_raw_connection()
+        # asyncpg's binary COPY; runs inside the transaction opened above
+        await raw.driver_connection.copy_records_to_table("_stage_students", records=records, columns=columns)
+        await conn.execute(
+            text(
+                f"INSERT INTO {target} (name, roll_number, github_username, leetcode_username) "
+                "SELECT name, roll_number, github_username, leetcode_username FROM _stage_students "
+                "ON CONFLICT (roll_number) DO UPDATE SET "
+                "name = EXCLUDED.name, "
+                "github_username = EXCLUDED.github_username, "
+                "leetcode_username = EXCLUDED.leetcode_username"
+            )
+        )
+    return len(records)
@@ -1,43 +1,60 @@
 from sqlalchemy import Table, Column, Integer, BigInteger, String, text
-from sqlalchemy.engine import Engine
 from sqlalchemy import inspect
-from database.utils import metadata
+from sqlalchemy.ext.asyncio import AsyncEngine
+from database.utils import metadata, has_table, has_table_cached, mark_table_exists
+
+
+# Table objects per name; rebuilding them per request defeats SQLAlchemy's compiled-statement cache
+_table_cache: dict[str, Table] = {}
+
+# Tables already known to have a BIGINT roll_number; the schema check runs once per table per process
+_rn_bigint_ok: set[str] = set()
 
 
 def student_table(table_name: str) -> Table:
-    return Table(
-        table_name,
-        metadata,
-        Column("name", String(255), nullable=False),
-    Column("roll_number", BigInteger, primary_key=True),
-        Column("github_username", String(255)),
-        Column("leetcode_username", String(255)),
-        extend_existing=True,
-    )
-
-
-def create_student_table(engine: Engine, table_name: str) -> bool:
-    inspector = inspect(engine)
-    if inspector.has_table(table_name):
+    tbl = _table_cache.get(table_name)
+    if tbl is None:
+        tbl = _table_cache[table_name] = Table(
+            table_name,
+            metadata,
+            Column("name", String(255), nullable=False),
+            Column("roll_number", BigInteger, primary_key=True),
+            Column("github_username", String(255)),
+            Column("leetcode_username", String(255)),
+            extend_existing=True,
+        )
+    return tbl
+
+
+async def create_student_table(engine: AsyncEngine, table_name: str) -> bool:
+    if await has_table_cached(engine, table_name):
         return False
     tbl = student_table(table_name)
-    metadata.create_all(bind=engine, tables=[tbl])
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all, tables=[tbl])
+    mark_table_exists(table_name)
+    # student_table() declares roll_number as BIGINT
+    _rn_bigint_ok.add(table_name)
     return True
 
 
-def ensure_rollnumber_bigint(engine: Engine, table_name: str) -> None:
+async def ensure_rollnumber_bigint(engine: AsyncEngine, table_name: str) -> None:
     """If table exists and roll_number is not BIGINT, alter it to BIGINT."""
-    inspector = inspect(engine)
-    if not inspector.has_table(table_name):
+    if table_name in _rn_bigint_ok:
         return
-    cols = inspector.get_columns(table_name)
+    async with engine.connect() as conn:
+        if not await has_table(conn, table_name):
+            return
+        cols = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_columns(table_name))
     rn = next((c for c in cols if c.get("name") == "roll_number"), None)
     if rn is None:
         return
     # SQLAlchemy doesn't provide a portable type name here; check via Python class name
     col_type = type(rn.get("type")).__name__.lower()
     if "bigint" in col_type or "big_integer" in col_type:
+        _rn_bigint_ok.add(table_name)
         return
     # Attempt to alter type to BIGINT (PostgreSQL syntax)
-    with engine.begin() as conn:
-        conn.execute(text(f'ALTER TABLE "{table_name}" ALTER COLUMN roll_number TYPE BIGINT'))
+    async with engine.begin() as conn:
+        await conn.execute(text(f'ALTER TABLE "{table_name}" ALTER COLUMN roll_number TYPE BIGINT'))
+    _rn_bigint_ok.add(table_name)
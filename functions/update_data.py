@@ -1,23 +1,20 @@
 from typing import Dict, Any, List, Tuple, Optional
-from datetime import datetime, timezone
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import os, time
-from sqlalchemy import select, delete
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from cachetools import TTLCache
+from concurrent.futures import ProcessPoolExecutor
+import asyncio, json, multiprocessing, os
+import orjson
+from sqlalchemy import BigInteger, any_, bindparam, select, delete
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.dialects.postgresql import insert as pg_insert
-from sqlalchemy.engine import Engine
-from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.exc import OperationalError, InterfaceError
 
+from database.utils import tables_exist
 from functions.tables import student_table
-from functions.datatable import data_table
-from functions.clients import (
-    get_github_summary,
-    get_leetcode_profile,
-    get_leetcode_language_stats,
-    get_leetcode_badges,
-    get_github_contributions,
-    get_leetcode_calendar,
-)
+from functions.datatable import data_table, bulk_upsert_data, COPY_THRESHOLD
+from functions.clients import get_client, fetch_student, STATS_MAX_WORKERS
 from functions.notification import (
     create_notification_table,
     remove_notification_with_reason,
@@ -25,6 +22,68 @@ from functions.notification import (
 )
 
 
+# compute_stats is pure Python; with STATS_PROCESSES > 0 it runs in worker processes so it never
+# contends for the GIL with the event loop decoding in-flight fetches (0 keeps the thread offload)
+STATS_PROCESSES = int(os.getenv("STATS_PROCESSES", "0"))
+_stats_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_stats_pool() -> Optional[ProcessPoolExecutor]:
+    global _stats_pool
+    if _stats_pool is None and STATS_PROCESSES > 0:
+        # Never fork the running server (it has threads and open sockets); start clean interpreters
+        _stats_pool = ProcessPoolExecutor(
+            max_workers=STATS_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _stats_pool
+
+
+def shutdown_stats_pool() -> None:
+    global _stats_pool
+    if _stats_pool is not None:
+        _stats_pool.shutdown(cancel_futures=True)
+        _stats_pool = None
+
+
+# Calendar keys are unix seconds; UTC day buckets are plain integer division
+DAY_SECONDS = 86400
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_MAX_DAY = date.max.toordinal() - _EPOCH_ORDINAL
+# Progress history timestamps are recorded in IST (UTC+05:30)
+IST = timezone(timedelta(hours=5, minutes=30))
+
+
+@lru_cache(maxsize=4096)
+def _day_iso(day: int) -> str:
+    """YYYY-MM-DD for a unix day number; raises ValueError past year 9999 like fromtimestamp."""
+    return date.fromordinal(_EPOCH_ORDINAL + day).isoformat()
+
+
+# Data-table columns compute_stats produces, in table order
+STATS_KEYS = (
+    "git_followers",
+    "git_following",
+    "git_public_repo",
+    "git_original_repo",
+    "git_authored_repo",
+    "last_commit_date",
+    "git_badges",
+    "lc_total_solved",
+    "lc_easy",
+    "lc_medium",
+    "lc_hard",
+    "lc_ranking",
+    "lc_lastsubmission",
+    "lc_lastacceptedsubmission",
+    "lc_cur_streak",
+    "lc_max_streak",
+    "lc_badges",
+    "lc_language",
+    "lc_submission_history",
+    "gh_contribution_history",
+)
+
+
 def _safe_int(v: Any) -> int | None:
     try:
         return int(v) if v is not None else None
@@ -32,10 +91,15 @@ def _safe_int(v: Any) -> int | None:
         return None
 
 
-def _join_list(vals: List[str] | None) -> str | None:
-    if not vals:
+def _as_int(v: Any) -> int | None:
+    """_safe_int with exception-free fast paths for what the APIs actually send (ints, digit strings, None)."""
+    if type(v) is int:
+        return v
+    if v is None:
         return None
-    return ",".join(vals)
+    if type(v) is str and v.isascii() and v.isdigit():
+        return int(v)
+    return _safe_int(v)
 
 
 def compute_stats(
@@ -45,18 +109,23 @@ def compute_stats(
     lc_badges: Dict[str, Any],
     git_contri: Dict[str, Any] | None = None,
     lc_calendar: Dict[str, Any] | None = None,
+    today_utc: date | None = None,
 ) -> Dict[str, Any]:
-    followers = _safe_int(git_json.get("followers"))
-    following = _safe_int(git_json.get("following"))
-    public_repo = _safe_int(git_json.get("public_repo_count"))
+    # Several keys are read from each profile dict; bind the lookups once
+    gj = git_json.get
+    lp = lc_prof.get
 
-    original_repos = git_json.get("original_repos") or {}
-    authored_forks = git_json.get("authored_forks") or {}
+    followers = _as_int(gj("followers"))
+    following = _as_int(gj("following"))
+    public_repo = _as_int(gj("public_repo_count"))
+
+    original_repos = gj("original_repos") or {}
+    authored_forks = gj("authored_forks") or {}
     orig_count = len(original_repos)
     authored_count = len(authored_forks)
 
     last_commit_date = None
-    overall = git_json.get("overall_last_commit") or {}
+    overall = gj("overall_last_commit") or {}
     # Normalize to date-only (YYYY-MM-DD) whether ISO string or unix timestamp
     raw_last_commit = overall.get("date")
 
@@ -64,16 +133,17 @@ def compute_stats(
         try:
             if val is None:
                 return None
+            if type(val) is int and val >= 0:
+                return _day_iso(val // DAY_SECONDS)
             s = str(val).strip()
             if not s:
                 return None
-            if s.isdigit():
-                # treat as unix seconds
-                dt = datetime.fromtimestamp(int(s), tz=timezone.utc)
-                return dt.strftime('%Y-%m-%d')
-            # If ISO-like string, prefer first 10 chars when in YYYY-MM-DD format
+            # ISO-like strings are the common case: index compares settle them before any full-string scan
             if len(s) >= 10 and s[4] == '-' and s[7] == '-':
                 return s[:10]
+            if s.isdigit():
+                # treat as unix seconds
+                return _day_iso(int(s) // DAY_SECONDS)
             # best-effort parse
             try:
                 dt = datetime.fromisoformat(s.replace('Z', '+00:00'))
@@ -85,35 +155,35 @@ def compute_stats(
 
     last_commit_date = _to_date_only(raw_last_commit)
 
-    git_badges_list = []
-    badges_map = git_json.get("badges") or {}
-    if isinstance(badges_map, dict):
-        git_badges_list = list(badges_map.keys())
+    # Joined straight from the dict's keys; no intermediate list
+    badges_map = gj("badges")
+    git_badges = ",".join(badges_map) if isinstance(badges_map, dict) and badges_map else None
 
     # LeetCode profile
-    totalSolved = _safe_int(lc_prof.get("totalSolved"))
-    easy = _safe_int(lc_prof.get("easySolved"))
-    medium = _safe_int(lc_prof.get("mediumSolved"))
-    hard = _safe_int(lc_prof.get("hardSolved"))
-    ranking = _safe_int(lc_prof.get("ranking"))
+    totalSolved = _as_int(lp("totalSolved"))
+    easy = _as_int(lp("easySolved"))
+    medium = _as_int(lp("mediumSolved"))
+    hard = _as_int(lp("hardSolved"))
+    ranking = _as_int(lp("ranking"))
 
     def _to_date_from_ts(ts: Any) -> str | None:
         try:
             if ts is None:
                 return None
+            if type(ts) is int:
+                return _day_iso(ts // DAY_SECONDS) if ts >= 0 else None
             s = str(ts).strip()
             if not s:
                 return None
             if not s.isdigit():
                 return None
-            dt = datetime.fromtimestamp(int(s), tz=timezone.utc)
-            return dt.strftime('%Y-%m-%d')
+            return _day_iso(int(s) // DAY_SECONDS)
         except Exception:
             return None
 
     lastsubmission = None
     lastacceptedsubmission = None
-    recent = lc_prof.get("recentSubmissions") or []
+    recent = lp("recentSubmissions") or []
     if recent:
         # Most recent overall submission (first item)
         ts = recent[0].get("timestamp")
@@ -127,86 +197,92 @@ def compute_stats(
 
     # Languages
     lang_counts = lc_lang.get("matchedUser", {}).get("languageProblemCount", [])
-    languages = [str(x.get("languageName")) for x in lang_counts if x.get("languageName")]
+    languages = ",".join(str(n) for n in (x.get("languageName") for x in lang_counts) if n) or None
 
     # LeetCode badges: store badgesCount in lc_badges as requested
-    lc_badges_count = _safe_int(lc_badges.get("badgesCount"))
-
-    # LeetCode streaks from submissionCalendar (map of unixDay -> count)
-    def _calc_streaks(sub_cal: Dict[str, Any]) -> tuple[int | None, int | None]:
-        if not isinstance(sub_cal, dict) or not sub_cal:
-            return None, None
-        try:
-            # Convert keys to ints (days in seconds), normalize to UTC dates
-            days = set()
-            for k, v in sub_cal.items():
-                if v is None:
-                    continue
-                s = str(k).strip()
-                if not s.isdigit():
-                    continue
-                ts = int(s)
-                if ts <= 0:
-                    continue
-                d = datetime.fromtimestamp(ts, tz=timezone.utc).date()
-                days.add(d)
-            if not days:
-                return 0, 0
-            # Compute longest contiguous daily streak and current streak up to today (UTC)
-            max_streak = 0
-            cur_streak = 0
-            d = min(days)
-            end = max(days)
-            one = timedelta(days=1)
-            while d <= end:
-                if d in days:
-                    cur_streak += 1
-                    max_streak = max(max_streak, cur_streak)
-                else:
-                    cur_streak = 0
-                d = d + one
-            # Current streak: count backwards from today if continuous
-            today = datetime.now(tz=timezone.utc).date()
-            cur = 0
-            d = today
-            while d in days:
-                cur += 1
-                d = d - one
-            return cur, max_streak
-        except Exception:
-            return None, None
+    lc_badges_count = _as_int(lc_badges.get("badgesCount"))
 
-    from datetime import timedelta  # local import to avoid widening module imports
     # submission calendar may appear from profile or dedicated calendar endpoint
-    sub_cal_raw = lc_prof.get("submissionCalendar") or {}
+    sub_cal_raw = lp("submissionCalendar") or {}
     # The calendar endpoint wraps it as string under 'submissionCalendar'
     if lc_calendar and isinstance(lc_calendar.get("submissionCalendar"), str):
         try:
-            import json as _json
-            sub_cal_raw = _json.loads(lc_calendar["submissionCalendar"]) or sub_cal_raw
+            sub_cal_raw = json.loads(lc_calendar["submissionCalendar"]) or sub_cal_raw
         except Exception:
             pass
-    lc_cur_streak, lc_max_streak = _calc_streaks(sub_cal_raw or {})
 
-    # Normalize and store universal history formats
-    # - LeetCode: map of YYYY-MM-DD -> count
-    lc_history: Dict[str, int] | None = None
-    try:
-        if isinstance(sub_cal_raw, dict) and sub_cal_raw:
-            lc_history = {}
+    # Parse the calendar keys once (unix seconds -> (ts, raw count)); streaks and history both read this.
+    # None means there is no usable calendar at all.
+    cal_entries: List[Tuple[int, Any]] | None = None
+    if isinstance(sub_cal_raw, dict) and sub_cal_raw:
+        try:
+            cal_entries = []
             for k, v in sub_cal_raw.items():
                 s = str(k).strip()
                 if s.isdigit():
                     ts = int(s)
                     if ts > 10**10:  # milliseconds guard
                         ts = ts // 1000
-                    d = datetime.fromtimestamp(ts, tz=timezone.utc).date().isoformat()
-                    lc_history[d] = int(v or 0)
+                    cal_entries.append((ts, v))
+        except Exception:
+            cal_entries = None
+
+    # LeetCode streaks from submissionCalendar (map of unixDay -> count)
+    def _calc_streaks(entries: List[Tuple[int, Any]] | None) -> tuple[int | None, int | None]:
+        if entries is None:
+            return None, None
+        # UTC day numbers with a recorded count
+        days: set[int] = set()
+        for ts, v in entries:
+            if v is None or ts <= 0:
+                continue
+            d = ts // DAY_SECONDS
+            if d > _MAX_DAY:
+                # not representable as a date; treat the calendar as unusable
+                return None, None
+            days.add(d)
+        if not days:
+            return 0, 0
+        # Longest contiguous daily streak: one pass over the sorted active days (gaps are skipped,
+        # not walked day by day)
+        ordered = sorted(days)
+        max_streak = run = 1
+        for prev, d in zip(ordered, ordered[1:]):
+            if d - prev == 1:
+                run += 1
+                if run > max_streak:
+                    max_streak = run
+            else:
+                run = 1
+        # Current streak: count backwards from today if continuous
+        if today_utc is None:
+            today = int(datetime.now(tz=timezone.utc).timestamp()) // DAY_SECONDS
+        else:
+            today = today_utc.toordinal() - _EPOCH_ORDINAL
+        cur = 0
+        d = today
+        while d in days:
+            cur += 1
+            d -= 1
+        return cur, max_streak
+
+    lc_cur_streak, lc_max_streak = _calc_streaks(cal_entries)
+
+    # Normalize and store universal history formats
+    # - LeetCode: map of YYYY-MM-DD -> count
+    # Serialized with orjson inside the try, so a count it cannot encode (> 64-bit) drops the history
+    lc_history_json: str | None = None
+    try:
+        if cal_entries is not None:
+            lc_history: Dict[str, int] = {}
+            for ts, v in cal_entries:
+                lc_history[_day_iso(ts // DAY_SECONDS)] = int(v or 0)
+            lc_history_json = orjson.dumps(lc_history).decode()
     except Exception:
-        lc_history = None
+        lc_history_json = None
 
     # - GitHub: map of YYYY-MM-DD -> count from contributionDays
-    gh_history: Dict[str, int] | None = None
+    gh_history_json: str | None = None
     try:
         days: Dict[str, int] = {}
         if git_contri and isinstance(git_contri.get("weeks"), list):
@@ -216,9 +292,9 @@ def compute_stats(
                     cnt = d.get("contributionCount")
                     if day:
                         days[str(day)] = int(cnt or 0)
-        gh_history = days if days else None
+        gh_history_json = orjson.dumps(days).decode() if days else None
     except Exception:
-        gh_history = None
+        gh_history_json = None
 
     return {
         "git_followers": followers,
@@ -227,7 +303,7 @@ def compute_stats(
         "git_original_repo": orig_count,
         "git_authored_repo": authored_count,
         "last_commit_date": last_commit_date,
-        "git_badges": _join_list(git_badges_list),
+        "git_badges": git_badges,
         "lc_total_solved": totalSolved,
         "lc_easy": easy,
         "lc_medium": medium,
@@ -238,21 +314,38 @@ def compute_stats(
     "lc_cur_streak": lc_cur_streak,
     "lc_max_streak": lc_max_streak,
     "lc_badges": str(lc_badges_count) if lc_badges_count is not None else None,
-        "lc_language": _join_list(languages),
+        "lc_language": languages,
         # universal histories as JSON strings for portability
-        "lc_submission_history": (None if lc_history is None else __import__("json").dumps(lc_history, separators=(",", ":"))),
-        "gh_contribution_history": (None if gh_history is None else __import__("json").dumps(gh_history, separators=(",", ":"))),
+        "lc_submission_history": lc_history_json,
+        "gh_contribution_history": gh_history_json,
         # Store total_solved for progress tracking (to be appended with timestamp later)
         "_lc_total_for_progress": totalSolved,
     }
 
 
-def update_all_students(engine: Engine, source_table: str, target_table: str) -> Tuple[int, List[str]]:
-    inspector = inspect(engine)
-    if not inspector.has_table(source_table):
-        raise ValueError(f"Source table '{source_table}' does not exist")
-    if not inspector.has_table(target_table):
-        raise ValueError(f"Target table '{target_table}' does not exist")
+# (engine url, source, target) combinations whose tables (and notification_Data) were recently seen.
+# Same 60s TTL as the table-existence cache, so a dropped table is reported as missing again.
+# Only touched from the event loop, so no lock is needed.
+_TABLE_CHECKED: TTLCache = TTLCache(maxsize=256, ttl=60)
+
+
+async def update_all_students(engine: AsyncEngine, source_table: str, target_table: str) -> Tuple[int, List[str]]:
+    key = (str(engine.url), source_table, target_table)
+    if key not in _TABLE_CHECKED:
+        # Both existence checks share one connection and one to_regclass query
+        async with engine.connect() as conn:
+            exists = await tables_exist(conn, source_table, target_table)
+        if not exists[source_table]:
+            raise ValueError(f"Source table '{source_table}' does not exist")
+        if not exists[target_table]:
+            raise ValueError(f"Target table '{target_table}' does not exist")
+        # Ensure notification table exists (idempotent)
+        try:
+            async with engine.begin() as conn:
+                await create_notification_table(conn)
+            _TABLE_CHECKED[key] = True
+        except Exception:
+            pass
 
     src = student_table(source_table)
     dst = data_table(target_table)
@@ -260,22 +353,17 @@ def update_all_students(engine: Engine, source_table: str, target_table: str) ->
 
     updated = 0
     errors: List[str] = []
-    # Ensure notification table exists (idempotent)
-    try:
-        create_notification_table(engine)
-    except Exception:
-        pass
 
     # Pull student list (outside long transaction)
-    with engine.connect() as conn:
-        rows = conn.execute(
+    async with engine.connect() as conn:
+        rows = (await conn.execute(
             select(
                 src.c.roll_number,
                 src.c.github_username,
                 src.c.leetcode_username,
                 src.c.name,
             )
-        ).all()
+        )).all()
 
     # Prepare work items
     work: List[Dict[str, Any]] = []
@@ -291,51 +379,222 @@ def update_all_students(engine: Engine, source_table: str, target_table: str) ->
     if not work:
         return 0, []
 
+    # One "today" for the whole run: streaks and the staleness check agree even across midnight
+    today_utc = datetime.now(tz=timezone.utc).date()
+
     # Concurrency and batch settings (tunable via env)
-    max_workers = int(os.getenv("STATS_MAX_WORKERS", "12"))  # slightly conservative default
-    batch_size = int(os.getenv("DB_UPSERT_BATCH_SIZE", "30"))
-    micro_batch_size = int(os.getenv("DB_MICRO_BATCH_SIZE", "8"))  # each VALUES group size
+    max_workers = STATS_MAX_WORKERS  # students fetched at once; the HTTP pool is sized from it
     max_retries = int(os.getenv("DB_MAX_RETRIES", "3"))
     base_sleep = float(os.getenv("DB_RETRY_BASE_SLEEP", "0.5"))
-    batch_size = max(1, min(batch_size, 100))  # clamp
-    micro_batch_size = max(1, min(micro_batch_size, batch_size))
 
-    # Fetch all external data concurrently
-    def _fetch_and_compute(item: Dict[str, Any]) -> Tuple[int, Dict[str, Any], str, Optional[str]]:
+    # Fetch all external data concurrently; the semaphore caps students in flight
+    sem = asyncio.Semaphore(max(1, max_workers))
+    stats_pool = _get_stats_pool()
+
+    async def _fetch_and_compute(client, item: Dict[str, Any]) -> Tuple[int, Dict[str, Any], str, Optional[str]]:
         roll = item["roll"]
-        gh = item["gh"]
-        lc = item["lc"]
         name = item["name"]
-        git_json: Dict[str, Any] = {}
-        lc_prof: Dict[str, Any] = {}
-        lc_lang: Dict[str, Any] = {}
-        lc_bdg: Dict[str, Any] = {}
         try:
-            if gh:
-                git_json = get_github_summary(gh)
-                git_contri = get_github_contributions(gh)
-            if lc:
-                lc_prof = get_leetcode_profile(lc)
-                lc_lang = get_leetcode_language_stats(lc)
-                lc_bdg = get_leetcode_badges(lc)
-                lc_calendar = get_leetcode_calendar(lc)
-            stats = compute_stats(git_json, lc_prof, lc_lang, lc_bdg, git_contri, lc_calendar)
+            async with sem:
+                raw = await fetch_student(client, item["gh"], item["lc"])
+            args = (
+                raw.get("git_json") or {},
+                raw.get("lc_prof") or {},
+                raw.get("lc_lang") or {},
+                raw.get("lc_badges") or {},
+                raw.get("git_contri"),
+                raw.get("lc_calendar"),
+                today_utc,
+            )
+            # Calendar/streak parsing is pure Python; keep it off the event loop serving other requests
+            if stats_pool is not None:
+                stats = await asyncio.get_running_loop().run_in_executor(stats_pool, compute_stats, *args)
+            else:
+                stats = await asyncio.to_thread(compute_stats, *args)
             return roll, stats, name, None
         except Exception as e:
             return roll, {}, name, f"roll={roll}: {type(e).__name__}: {e}"
 
-    results: List[Tuple[int, Dict[str, Any], str]] = []
     to_add_notif: List[Dict[str, Any]] = []
     to_remove_notif: List[int] = []
 
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        fut_map = {ex.submit(_fetch_and_compute, item): item for item in work}
-        for fut in as_completed(fut_map):
-            roll, stats, name, err = fut.result()
+    # Computed rows stream to a single writer as students complete, so DB writes overlap the
+    # remaining fetches and at most a queue's worth of stats is held in memory. The writer lingers
+    # up to DB_WRITE_LINGER seconds to fill a batch; a full batch defaults to the COPY threshold.
+    write_batch_size = max(1, int(os.getenv("DB_WRITE_BATCH_SIZE", str(COPY_THRESHOLD))))
+    write_linger = float(os.getenv("DB_WRITE_LINGER", "1.0"))
+    queue: asyncio.Queue = asyncio.Queue(maxsize=write_batch_size)
+    dst_cols = {c.name for c in dst.columns}
+    # Snapshot destination column names to filter payloads (backward compatible); the
+    # surviving key set is fixed for the run, so every payload row is built from it directly
+    allowed = tuple(k for k in ("rollnumber", *STATS_KEYS, "lc_progress_history") if k in dst_cols)
+
+    # Helper to write one batch in one executemany with retries. Each attempt runs in a savepoint, so a
+    # failed batch is rolled back on its own and reported in errors while the run's transaction carries on.
+    async def _execute_payload(conn, payload_list: List[Dict[str, Any]]):
+        nonlocal updated
+        if not payload_list:
+            return
+        attempt = 0
+        while True:
+            try:
+                async with conn.begin_nested():
+                    written = await bulk_upsert_data(conn, target_table, payload_list)
+                updated += written
+                return
+            except (OperationalError, InterfaceError) as oe:
+                attempt += 1
+                if attempt > max_retries:
+                    errors.append(f"upsert retries exceeded ({len(payload_list)} rows): {type(oe).__name__}: {oe}")
+                    return
+                sleep_for = base_sleep * (2 ** (attempt - 1))
+                await asyncio.sleep(sleep_for)
+            except Exception as e:
+                errors.append(f"upsert error ({len(payload_list)} rows): {type(e).__name__}: {e}")
+                return
+
+    async def _write_batch(conn, batch: List[Tuple[int, Dict[str, Any]]]) -> None:
+        existing_progress: Dict[int, List[Dict[str, Any]]] = {}
+        fetch_stmt = select(dst.c.rollnumber, dst.c.lc_progress_history).where(
+            dst.c.rollnumber.in_([roll for roll, _ in batch])
+        )
+        for row in await conn.execute(fetch_stmt):
+            roll_num = int(row.rollnumber)
+            history = row.lc_progress_history
+            # Parse if stored as string
+            if isinstance(history, str):
+                try:
+                    history = orjson.loads(history)
+                except Exception:
+                    history = []
+            existing_progress[roll_num] = history if isinstance(history, list) else []
+
+        payload: List[Dict[str, Any]] = []
+        for roll, stats in batch:
+            # Handle progress history: append new entry with timestamp and count
+            total_solved = stats.pop("_lc_total_for_progress", None)
+            # Get existing history for this roll number
+            history = existing_progress.get(roll, [])
+            if total_solved is not None:
+                # Create new entry with current timestamp in IST (UTC+05:30)
+                ist_time = datetime.now(tz=timezone.utc).astimezone(IST)
+                new_entry = {
+                    "timestamp": ist_time.isoformat(),
+                    "count": total_solved
+                }
+
+                history.append(new_entry)
+                history = history[-200:]
+
+            stats["rollnumber"] = roll
+            # Carried over unchanged for GitHub-only rows; orjson's output is already compact
+            stats["lc_progress_history"] = orjson.dumps(history).decode() if history else None
+
+            payload.append({k: stats.get(k) for k in allowed})
+
+        await _execute_payload(conn, payload)
+
+    async def _write_notifications(conn) -> None:
+        # 1) clear resolved notifications: one DELETE with the rolls bound as a single array (= ANY($n))
+        reason_text = "No LC submission in last 3 days"
+        if to_remove_notif:
+            try:
+                del_stmt = (
+                    delete(notif_tbl)
+                    .where(
+                        notif_tbl.c.table_name == source_table,
+                        notif_tbl.c.reason == reason_text,
+                        notif_tbl.c.rollnumber == any_(bindparam("rolls", type_=ARRAY(BigInteger))),
+                    )
+                )
+                async with conn.begin_nested():
+                    await conn.execute(del_stmt, {"rolls": to_remove_notif})
+            except Exception as ne:
+                errors.append(f"notif-remove batch: {type(ne).__name__}: {ne}")
+
+        # 2) upsert notifications to add: one statement executed over the whole list (asyncpg pipelines the rows)
+        notif_ins = pg_insert(notif_tbl)
+        notif_stmt = notif_ins.on_conflict_do_update(
+            index_elements=[notif_tbl.c.table_name, notif_tbl.c.rollnumber],
+            set_={
+                "name": notif_ins.excluded.name,
+                "reason": notif_ins.excluded.reason,
+            },
+        )
+        attempt = 0
+        while to_add_notif:
+            try:
+                async with conn.begin_nested():
+                    await conn.execute(notif_stmt, to_add_notif)
+                break
+            except (OperationalError, InterfaceError) as oe:
+                attempt += 1
+                if attempt > max_retries:
+                    errors.append(f"notif-upsert retries exceeded: {type(oe).__name__}: {oe}")
+                    break
+                await asyncio.sleep(base_sleep * (2 ** (attempt - 1)))
+            except Exception as ne:
+                errors.append(f"notif-upsert batch: {type(ne).__name__}: {ne}")
+                break
+
+    async def _writer() -> None:
+        # One transaction for the whole run: batches are written as they arrive, notifications once
+        # every student is in (None marks the end of the stream). If this fails, the producer sees
+        # writer.done() and stops fetching.
+        done = False
+        loop = asyncio.get_running_loop()
+        async with engine.begin() as conn:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                # Students finish one at a time; wait a little so they share one SELECT + upsert
+                deadline = loop.time() + write_linger
+                while len(batch) < write_batch_size:
+                    if queue.empty():
+                        remaining = deadline - loop.time()
+                        if remaining <= 0:
+                            break
+                        try:
+                            item = await asyncio.wait_for(queue.get(), remaining)
+                        except asyncio.TimeoutError:
+                            break
+                    else:
+                        item = queue.get_nowait()
+                    if item is None:
+                        done = True
+                        break
+                    batch.append(item)
+                await _write_batch(conn, batch)
+                if done:
+                    break
+            await _write_notifications(conn)
+
+    async def _enqueue(item: Optional[Tuple[int, Dict[str, Any]]]) -> bool:
+        # Hand an item to the writer; False if the writer stopped before there was room for it
+        if not queue.full():
+            queue.put_nowait(item)
+            return True
+        put = asyncio.ensure_future(queue.put(item))
+        await asyncio.wait((put, writer), return_when=asyncio.FIRST_COMPLETED)
+        if put.done():
+            return True
+        put.cancel()
+        return False
+
+    writer = asyncio.create_task(_writer())
+    client = get_client()
+    tasks = [asyncio.create_task(_fetch_and_compute(client, item)) for item in work]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            roll, stats, name, err = await fut
+            if writer.done():
+                # The write transaction is gone; fetching the rest of the cohort would be wasted
+                break
             if err:
                 errors.append(err)
                 continue
-            results.append((roll, stats, name))
             # Notification decision now; we'll apply in bulk later
             lc_last = stats.get("lc_lastsubmission")
             reason_text = "No LC submission in last 3 days"
@@ -343,8 +602,7 @@ def update_all_students(engine: Engine, source_table: str, target_table: str) ->
             if lc_last:
                 try:
                     last_date = datetime.strptime(lc_last, "%Y-%m-%d").date()
-                    today = datetime.now(tz=timezone.utc).date()
-                    delta = (today - last_date).days
+                    delta = (today_utc - last_date).days
                     flag = delta > 3
                 except Exception:
                     flag = True
@@ -359,136 +617,14 @@ def update_all_students(engine: Engine, source_table: str, target_table: str) ->
                 })
             else:
                 to_remove_notif.append(roll)
-
-    def _chunks(seq: List[Any], size: int):
-        for i in range(0, len(seq), size):
-            yield seq[i:i + size]
-
-    with engine.begin() as conn:
-        existing_progress: Dict[int, List[Dict[str, Any]]] = {}
-        if results:
-            roll_numbers = [roll for roll, _, _ in results]
-            fetch_stmt = select(dst.c.rollnumber, dst.c.lc_progress_history).where(
-                dst.c.rollnumber.in_(roll_numbers)
-            )
-            for row in conn.execute(fetch_stmt):
-                roll_num = int(row.rollnumber)
-                history = row.lc_progress_history
-                # Parse if stored as string
-                if isinstance(history, str):
-                    try:
-                        import json as _json
-                        history = _json.loads(history)
-                    except Exception:
-                        history = []
-                existing_progress[roll_num] = history if isinstance(history, list) else []
-
-        # Snapshot destination column names to filter payloads (backward compatible)
-        dst_cols = {c.name for c in dst.columns}
-        # Helper to execute one micro batch with retries
-        def _execute_payload(payload_list: List[Dict[str, Any]]):
-            nonlocal updated
-            if not payload_list:
-                return
-            stmt = pg_insert(dst).values(payload_list)
-            update_cols = {k: stmt.excluded[k] for k in payload_list[0].keys() if k != "rollnumber"}
-            stmt = stmt.on_conflict_do_update(
-                index_elements=[dst.c.rollnumber],
-                set_=update_cols,
-            )
-            attempt = 0
-            while True:
-                try:
-                    conn.execute(stmt)
-                    updated += len(payload_list)
-                    return
-                except (OperationalError, InterfaceError) as oe:
-                    attempt += 1
-                    if attempt > max_retries:
-                        errors.append(f"upsert retries exceeded ({len(payload_list)} rows): {type(oe).__name__}: {oe}")
-                        return
-                    sleep_for = base_sleep * (2 ** (attempt - 1))
-                    time.sleep(sleep_for)
-                except Exception as e:
-                    errors.append(f"upsert error ({len(payload_list)} rows): {type(e).__name__}: {e}")
-                    return
-
-        # Outer batches subdivided to micro-batches to limit single statement size
-        for outer in _chunks(results, batch_size):
-            for micro in _chunks(outer, micro_batch_size):
-                raw = []
-                for roll, stats, _name in micro:
-                    row_data = {"rollnumber": roll, **stats}
-                    
-                    # Handle progress history: append new entry with timestamp and count
-                    total_solved = stats.pop("_lc_total_for_progress", None)
-                    if total_solved is not None:
-                        # Get existing history for this roll number
-                        history = existing_progress.get(roll, [])
-                        
-                        # Create new entry with current timestamp in IST (UTC+05:30)
-                        import json as _json
-                        from datetime import timedelta
-                        IST = timezone(timedelta(hours=5, minutes=30))
-                        ist_time = datetime.now(tz=timezone.utc).astimezone(IST)
-                        new_entry = {
-                            "timestamp": ist_time.isoformat(),
-                            "count": total_solved
-                        }
-                        
-                        history.append(new_entry)
-                        history = history[-200:]
-                        
-                        row_data["lc_progress_history"] = _json.dumps(history, separators=(",", ":"))
-                    
-                    raw.append(row_data)
-                
-                payload = [{k: v for k, v in row.items() if k in dst_cols} for row in raw]
-                _execute_payload(payload)
-
-        reason_text = "No LC submission in last 3 days"
-        for roll_chunk in _chunks(to_remove_notif, max(1, batch_size)):
-            try:
-                if not roll_chunk:
-                    continue
-                del_stmt = (
-                    delete(notif_tbl)
-                    .where(
-                        notif_tbl.c.table_name == source_table,
-                        notif_tbl.c.reason == reason_text,
-                        notif_tbl.c.rollnumber.in_(roll_chunk),
-                    )
-                )
-                conn.execute(del_stmt)
-            except Exception as ne:
-                errors.append(f"notif-remove batch: {type(ne).__name__}: {ne}")
-
-        # 2) upsert notifications to add
-        for chunk in _chunks(to_add_notif, batch_size):
-            for micro in _chunks(chunk, micro_batch_size):
-                if not micro:
-                    continue
-                stmt = pg_insert(notif_tbl).values(micro)
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=[notif_tbl.c.table_name, notif_tbl.c.rollnumber],
-                    set_={
-                        "name": stmt.excluded.name,
-                        "reason": stmt.excluded.reason,
-                    },
-                )
-                attempt = 0
-                while True:
-                    try:
-                        conn.execute(stmt)
-                        break
-                    except (OperationalError, InterfaceError) as oe:
-                        attempt += 1
-                        if attempt > max_retries:
-                            errors.append(f"notif-upsert retries exceeded: {type(oe).__name__}: {oe}")
-                            break
-                        time.sleep(base_sleep * (2 ** (attempt - 1)))
-                    except Exception as ne:
-                        errors.append(f"notif-upsert batch: {type(ne).__name__}: {ne}")
-                        break
+            if not await _enqueue((roll, stats)):
+                break
+        await _enqueue(None)
+        # Raises the writer's error, if any
+        await writer
+    finally:
+        for t in tasks:
+            t.cancel()
+        writer.cancel()
 
     return updated, errors